@@ -0,0 +1,139 @@
+import functools
+import json
+import os
+import tempfile
+import time
+from hashlib import md5
+
+import pandas as pd
+
+
+# Simple file-backed cache: each entry is a parquet file plus a small JSON
+# sidecar holding its expiry time, so entries survive app restarts. Expired
+# entries are removed, and beyond max_entries the least recently used go.
+class FileCache:
+    def __init__(self, directory=".cache", max_entries=512):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _data_path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    # Return the cached DataFrame, or None if missing or expired
+    def get(self, key):
+        try:
+            with open(self._meta_path(key)) as f:
+                expires_at = json.load(f)["expires_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if time.time() > expires_at:
+            return None
+
+        try:
+            df = pd.read_parquet(self._data_path(key), engine="pyarrow", memory_map=True)
+        except (OSError, ValueError):
+            return None
+
+        # The sidecar's mtime doubles as the last-used time for eviction
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            pass
+        return df
+
+    # Store a DataFrame for ttl seconds (float('inf') never expires)
+    def set(self, key, df, ttl):
+        self._write_atomic(
+            self._data_path(key),
+            lambda path: df.to_parquet(path, engine="pyarrow", compression="zstd")
+        )
+        # Write the sidecar last so a half-written entry is never treated as valid
+        self._write_atomic(
+            self._meta_path(key),
+            lambda path: self._write_meta(path, time.time() + ttl)
+        )
+        self._evict()
+
+    @staticmethod
+    def _write_meta(path, expires_at):
+        with open(path, "w") as f:
+            json.dump({"expires_at": expires_at}, f)
+
+    # Write to a temp file and move it into place, so concurrent writers can't
+    # interleave and readers (which memory-map the data) never see a partial file
+    def _write_atomic(self, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _remove(self, key):
+        for path in (self._meta_path(key), self._data_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Remove expired entries, then the least recently used beyond max_entries
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            try:
+                last_used = os.path.getmtime(self._meta_path(key))
+                with open(self._meta_path(key)) as f:
+                    expires_at = json.load(f)["expires_at"]
+            except (OSError, ValueError, KeyError):
+                continue
+
+            if now > expires_at:
+                self._remove(key)
+            else:
+                entries.append((last_used, key))
+
+        entries.sort()
+        for _, key in entries[:max(0, len(entries) - self.max_entries)]:
+            self._remove(key)
+
+
+# Decorator caching a DataFrame-returning function in a FileCache, keyed on an
+# MD5 of the function name and its arguments. cache is a FileCache or a
+# callable returning one, resolved on each call. ttl is either a number of
+# seconds or a callable receiving the same arguments as the function. None
+# results (e.g. failed downloads) are not cached.
+def cached_parquet(cache, ttl):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            file_cache = cache() if callable(cache) else cache
+            parts = [func.__qualname__, *map(str, args)]
+            parts += [f"{name}={value}" for name, value in sorted(kwargs.items())]
+            key = md5("|".join(parts).encode()).hexdigest()
+
+            cached = file_cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = func(*args, **kwargs)
+            if result is not None:
+                file_cache.set(key, result, ttl(*args, **kwargs) if callable(ttl) else ttl)
+            return result
+
+        return wrapper
+
+    return decorator
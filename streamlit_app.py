@@ -1,9 +1,20 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
+from numba import njit
+from tsdownsample import LTTBDownsampler
 import pandas as pd
-import yfinance as yf
-from datetime import datetime
+import yfinance_cache as yfc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from cache import FileCache, cached_parquet
+
+# Persistent cache shared across app restarts, one instance per process
+@st.cache_resource
+def get_file_cache():
+    return FileCache(".cache")
 
 # Custom CSS for changing background color and other styles
 def apply_custom_css():
@@ -31,82 +42,206 @@ def apply_custom_css():
         unsafe_allow_html=True
     )
 
-# Function to fetch stock data with caching
-@st.cache_data
+# List of popular stock symbols
+DEFAULT_SYMBOLS = ["AAPL", "GOOG", "MSFT", "AMZN", "TSLA", "NVDA", "META", "CRM", "JPM", "XOM"]
+
+# Recent ranges can still change; fully historical ones never do
+def cache_ttl(end_date):
+    return 86400 if end_date >= datetime.now().date() - timedelta(days=1) else float('inf')
+
+# Function to fetch one symbol's adjusted closes with caching
+# yfinance-cache keeps prices on disk (~/.cache/yfc) and only fetches the missing
+# days, so restarts are cheap; the result is cached as memory-mapped parquet,
+# which is smaller and faster to load than st.cache_data's pickles.
+@cached_parquet(get_file_cache, ttl=lambda symbol, start_date, end_date: cache_ttl(end_date))
+def download_stock_data(symbol, start_date, end_date):
+    history = yfc.Ticker(symbol).history(
+        start=start_date, end=end_date, adjust_splits=True, adjust_divs=True
+    )
+    if 'Close' not in history or history.empty:
+        return None
+    return history[['Close']]
+
+# Function to fetch several symbols at once as a column-major float32 frame
+# Symbols are fetched in parallel (yfc.download uses a process pool and exits
+# on errors, which doesn't suit a Streamlit server). A failing symbol is
+# reported on its own in the returned errors instead of failing the batch.
+# Each symbol's prices end up contiguous in memory, which keeps per-column
+# work like the 200-day rolling mean cache-friendly. Applied after the
+# parquet cache since the layout isn't preserved on disk.
+# st.cache_data keeps the combined frame in memory on top of the parquet
+# cache; the hourly ttl also retries symbols that failed to download.
+@st.cache_data(ttl=3600)
+def get_all_stock_data(symbols, start_date, end_date):
+    def fetch(symbol):
+        try:
+            return download_stock_data(symbol, start_date, end_date), None
+        except Exception as e:
+            return None, e
+
+    # Worker threads share the script context so st.cache_resource works in them
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=len(symbols), initializer=add_script_run_ctx, initargs=(None, ctx)) as pool:
+        results = list(pool.map(fetch, symbols))
+
+    # Symbols without data are left out so the remaining date indexes still align
+    closes = {symbol: frame['Close'] for symbol, (frame, _) in zip(symbols, results) if frame is not None and not frame.empty}
+    errors = {symbol: str(error) for symbol, (_, error) in zip(symbols, results) if error is not None}
+    if not closes:
+        return None, errors
+
+    stock_data = pd.concat(closes, axis=1)
+
+    # float32 keeps ample precision for prices at half the memory and JSON size
+    values = np.asfortranarray(stock_data.to_numpy(dtype=np.float32))
+    # Daily bars don't need the exchange timezone; a naive index converts to a
+    # datetime64 array rather than an object array of Timestamps
+    index = stock_data.index
+    if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+        index = index.tz_localize(None)
+    return pd.DataFrame(values, index=index, columns=stock_data.columns, copy=False), errors
+
+# Function to fetch stock data for a single symbol from the batched download
 def get_stock_data(stock_symbol, start_date, end_date):
-    try:
-        stock_data = yf.download(stock_symbol, start=start_date, end=end_date)
-        if not stock_data.empty:
-            return stock_data['Adj Close']
-        else:
-            st.warning(f"No data found for {stock_symbol}.")
-            return None
-    except Exception as e:
-        st.error(f"Error fetching data: {e}")
+    all_stock_data, errors = get_all_stock_data(tuple(DEFAULT_SYMBOLS), start_date, end_date)
+    if stock_symbol in errors:
+        st.error(f"Error fetching data: {errors[stock_symbol]}")
+        # Drop the in-memory batch so the next run retries the download
+        get_all_stock_data.clear()
         return None
 
+    if all_stock_data is not None and stock_symbol in all_stock_data.columns:
+        stock_data = all_stock_data[stock_symbol].dropna()
+        if not stock_data.empty:
+            return stock_data
+
+    st.warning(f"No data found for {stock_symbol}.")
+    return None
+
+# Simple moving average with a running-sum accumulator, compiled by Numba:
+# a single O(N) pass, NaN-padded at the head like rolling().mean(). The sum
+# is kept in float64 so float32 input doesn't drift; cache=True stores the
+# compiled code on disk so app restarts skip recompilation.
+@njit(cache=True, fastmath=True)
+def rolling_mean(values, window):
+    sma = np.full_like(values, np.nan)
+    total = 0.0
+    for i in range(len(values)):
+        total += values[i]
+        if i >= window:
+            total -= values[i - window]
+        if i >= window - 1:
+            sma[i] = total / window
+    return sma
+
 # Function to calculate simple moving averages (SMAs)
+# Only called while building a graph, which build_stock_graph caches per
+# symbol and date range, so reruns don't recompute it.
 def calculate_sma(stock_data, short_window=20, long_window=200):
-    short_sma = stock_data.rolling(window=short_window).mean()
-    long_sma = stock_data.rolling(window=long_window).mean()
+    prices = stock_data.to_numpy(dtype=np.float32)
+    short_sma = rolling_mean(prices, short_window)
+    long_sma = rolling_mean(prices, long_window)
     return short_sma, long_sma
 
+# Range selector buttons and static layout for the graph, built once at import
+RANGE_SELECTOR_BUTTONS = [
+    dict(count=1, label="1m", step="month", stepmode="backward"),
+    dict(count=6, label="6m", step="month", stepmode="backward"),
+    dict(count=1, label="YTD", step="year", stepmode="todate"),
+    dict(count=1, label="1y", step="year", stepmode="backward"),
+    dict(step="all")
+]
+
+GRAPH_LAYOUT = dict(
+    xaxis=dict(
+        rangeselector=dict(buttons=RANGE_SELECTOR_BUTTONS),
+        rangeslider=dict(visible=False),
+        type="date",
+        title=dict(text='Date')
+    ),
+    yaxis=dict(title=dict(text='Price')),
+    plot_bgcolor='#f5f5f5',
+    paper_bgcolor='#f0f4f8',
+    font=dict(color='#1f2e3d'),
+    height=600
+)
+
+# Plotly config passed with every chart
+PLOTLY_CONFIG = {'displaylogo': False, 'responsive': True, 'scrollZoom': True}
+
+# Most points sent to the browser per trace
+MAX_PLOT_POINTS = 1000
+
+# Downsample a line with LTTB so wide date ranges send at most MAX_PLOT_POINTS
+# points while keeping its visual shape. Streamlit has no zoom callback, so
+# this is one pass over the whole range; zooming in doesn't recover detail.
+def downsample(x, y):
+    if len(y) <= MAX_PLOT_POINTS:
+        return x, y
+    indices = LTTBDownsampler().downsample(x.view(np.int64), y, n_out=MAX_PLOT_POINTS)
+    return x[indices], y[indices]
+
 # Function to create an interactive graph with SMAs
 def create_stock_graph(stock_data, short_sma, long_sma, title):
     if stock_data is None or stock_data.empty:
         st.error("No data available for plotting.")
         return None
 
-    fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=[title])
-
-    # Add range selector buttons
-    fig.update_layout(
-        xaxis=dict(
-            rangeselector=dict(
-                buttons=list([
-                    dict(count=1, label="1m", step="month", stepmode="backward"),
-                    dict(count=6, label="6m", step="month", stepmode="backward"),
-                    dict(count=1, label="YTD", step="year", stepmode="todate"),
-                    dict(count=1, label="1y", step="year", stepmode="backward"),
-                    dict(step="all")
-                ])
-            ),
-            rangeslider=dict(visible=False),
-            type="date"
-        ),
-        plot_bgcolor='#f5f5f5',
-        paper_bgcolor='#f0f4f8',
-        font=dict(color='#1f2e3d')
-    )
+    fig = go.Figure()
+
+    fig.update_layout(**GRAPH_LAYOUT, title_text=title)
 
     # Add traces for stock prices and SMAs
-    fig.add_trace(go.Scatter(x=stock_data.index, y=stock_data.values, mode='lines', name=title, line=dict(color="#007acc")))
-    fig.add_trace(go.Scatter(x=short_sma.index, y=short_sma.values, mode='lines', name='20-day SMA', line=dict(color="#20fc03")))
-    fig.add_trace(go.Scatter(x=long_sma.index, y=long_sma.values, mode='lines', name='200-day SMA', line=dict(color="#fc0303")))
-
-    # Update layout
-    fig.update_layout(
-        title_text=title,
-        xaxis_title='Date',
-        yaxis_title='Price',
-        height=600
-    )
+    # Plain numpy arrays take Plotly's fast encoding path; the NaN head of each
+    # SMA (before a full window is available) is trimmed so it isn't sent as nulls
+    x, y = downsample(stock_data.index.to_numpy(), stock_data.to_numpy(dtype=np.float32))
+    fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=title, line=dict(color="#007acc")))
+    for sma, name, color in [(short_sma, '20-day SMA', "#20fc03"), (long_sma, '200-day SMA', "#fc0303")]:
+        values = sma.to_numpy()
+        mask = ~np.isnan(values)
+        if mask.any():
+            x, y = downsample(sma.index[mask].to_numpy(), values[mask])
+            fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=name, line=dict(color=color)))
 
     return fig
 
-# Main Streamlit app
-def main():
-    # Apply custom CSS for background color
-    apply_custom_css()
+# Raised inside cached functions so a failed fetch isn't cached
+class StockDataUnavailable(Exception):
+    pass
 
-    st.title("📈 Stocks Dashboard")
+# Function to build the graph for a symbol and date range, with caching
+# The Figure is held by reference in st.cache_resource, so reruns that don't
+# change the selection skip fetching, slicing and re-adding traces. Only
+# successful builds are cached, for a day to match cache_ttl for recent ranges.
+@st.cache_resource(max_entries=32, ttl=86400)
+def build_stock_graph(stock_symbol, start_date, end_date):
+    # Fetch stock data (all default symbols are downloaded together, so
+    # switching symbols in the sidebar is a cache hit)
+    stock_data = get_stock_data(stock_symbol, start_date, end_date)
+    if stock_data is None:
+        raise StockDataUnavailable(stock_symbol)
+
+    # Calculate Simple Moving Averages (SMAs)
+    short_sma, long_sma = calculate_sma(stock_data)
+    short_sma = pd.Series(short_sma, index=stock_data.index)
+    long_sma = pd.Series(long_sma, index=stock_data.index)
 
-    # List of popular stock symbols
-    default_symbols = ["AAPL", "GOOG", "MSFT", "AMZN", "TSLA", "NVDA", "META", "CRM", "JPM", "XOM"]
+    # Display only the last year of data
+    stock_data_last_year = stock_data.tail(252)
+    short_sma_last_year, long_sma_last_year = short_sma.tail(252), long_sma.tail(252)
 
+    fig = create_stock_graph(stock_data_last_year, short_sma_last_year, long_sma_last_year, title=stock_symbol)
+    if fig is None:
+        raise StockDataUnavailable(stock_symbol)
+    return fig
+
+# Stock selection and chart, rerun on its own when one of its widgets changes
+# The sidebar widgets are written from inside the fragment, so changing them
+# reruns only this function.
+@st.fragment
+def stock_dashboard():
     # Sidebar inputs for user interaction
-    st.sidebar.header("Select Stock and Date Range")
-    stock_symbol = st.sidebar.selectbox("Choose a stock symbol", default_symbols)
+    stock_symbol = st.sidebar.selectbox("Choose a stock symbol", DEFAULT_SYMBOLS)
     start_date = st.sidebar.date_input("Start Date", value=datetime.now().date().replace(year=datetime.now().year - 3))
     end_date = st.sidebar.date_input("End Date", value=datetime.now().date())
 
@@ -115,24 +250,30 @@ def main():
         st.error("Start date must be before end date.")
         return
 
-    # Display the most recent update date
-    st.text(f"Last Update Date: {pd.to_datetime('today').strftime('%Y-%m-%d')}")
+    # Build (or reuse) the graph and plot it
+    try:
+        fig = build_stock_graph(stock_symbol, start_date, end_date)
+    except StockDataUnavailable:
+        # The reason was already shown by get_stock_data
+        return
 
-    # Fetch stock data
-    stock_data = get_stock_data(stock_symbol, start_date, end_date)
+    # theme=None skips Streamlit's theme merge; GRAPH_LAYOUT sets the colors
+    st.plotly_chart(fig, width='stretch', theme=None, config=PLOTLY_CONFIG)
+
+# Main Streamlit app
+def main():
+    # Apply custom CSS for background color
+    apply_custom_css()
+
+    st.title("📈 Stocks Dashboard")
 
-    if stock_data is not None:
-        # Calculate Simple Moving Averages (SMAs)
-        short_sma, long_sma = calculate_sma(stock_data)
+    # Display the most recent update date
+    st.text(f"Last Update Date: {pd.to_datetime('today').strftime('%Y-%m-%d')}")
 
-        # Display only the last year of data
-        stock_data_last_year = stock_data.tail(252)
-        short_sma_last_year, long_sma_last_year = short_sma.tail(252), long_sma.tail(252)
+    # Written on the full run so the fragment can add its widgets below it
+    st.sidebar.header("Select Stock and Date Range")
 
-        # Plot the graph
-        fig = create_stock_graph(stock_data_last_year, short_sma_last_year, long_sma_last_year, title=stock_symbol)
-        if fig:
-            st.plotly_chart(fig, use_container_width=True)
+    stock_dashboard()
 
 if __name__ == "__main__":
     main()